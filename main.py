@@ -8,8 +8,12 @@ from pathlib import Path
 
 import streamlit as st
 
-# Добавляем src в путь
-sys.path.insert(0, str(Path(__file__).parent / "src"))
+# Путь к src вычисляется один раз при импорте, а не на каждый rerun
+SRC_DIR = str(Path(__file__).parent / "src")
+
+# Добавляем src в путь (только если его там ещё нет)
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
 
 # Настройка страницы
 st.set_page_config(
@@ -19,15 +23,22 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-st.sidebar.page_link(
-    "pages/0_project_metrics.py", label="Dashboard - Обзор метрик", icon="📊"
-)
-st.sidebar.page_link("pages/1_parse.py", label="Парсинг", icon="📁")
-st.sidebar.page_link("pages/2_calibrate.py", label="Калибровка", icon="⚙️")
-st.sidebar.page_link("pages/3_forecast.py", label="Прогноз", icon="🔮")
-st.sidebar.page_link("pages/4_coefficients.py", label="Коэффициенты", icon="📊")
-st.sidebar.page_link("pages/11_documentation.py", label="О системе", icon="ℹ️")
-
-# Footer
-st.sidebar.divider()
-st.sidebar.caption("© 2025 Shield AI | MIT License")
+
+@st.cache_resource(show_spinner=False)
+def _build_nav() -> None:
+    """Навигация в сайдбаре (кэшируется, при rerun элементы воспроизводятся)"""
+    st.sidebar.page_link(
+        "pages/0_project_metrics.py", label="Dashboard - Обзор метрик", icon="📊"
+    )
+    st.sidebar.page_link("pages/1_parse.py", label="Парсинг", icon="📁")
+    st.sidebar.page_link("pages/2_calibrate.py", label="Калибровка", icon="⚙️")
+    st.sidebar.page_link("pages/3_forecast.py", label="Прогноз", icon="🔮")
+    st.sidebar.page_link("pages/4_coefficients.py", label="Коэффициенты", icon="📊")
+    st.sidebar.page_link("pages/11_documentation.py", label="О системе", icon="ℹ️")
+
+    # Footer
+    st.sidebar.divider()
+    st.sidebar.caption("© 2025 Shield AI | MIT License")
+
+
+_build_nav()
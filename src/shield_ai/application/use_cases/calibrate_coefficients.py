@@ -8,11 +8,16 @@ Use Case: Калибровка коэффициентов усушки
 продажу как отдельную порцию с собственным временем хранения.
 """
 
+import hashlib
 import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from scipy.optimize import minimize
+import numpy as np
+from scipy.optimize import least_squares
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
@@ -39,8 +44,24 @@ class CalibrateCoefficientsUseCase:
     фактическими значениями усушки.
     """
 
-    def __init__(self, session: Session):
+    # Кэш результатов калибровки по отпечатку входных данных (общий для всех
+    # экземпляров процесса): при неизменной истории товара оптимизация
+    # не повторяется
+    FIT_CACHE_SIZE = 1024
+    _fit_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _fit_cache_lock = threading.Lock()
+
+    def __init__(self, session: Session, max_workers: Optional[int] = 1):
+        """
+        Args:
+            session: Сессия БД
+            max_workers: Число процессов для оптимизации (1 - последовательно
+                         в текущем процессе, None - по числу CPU). По умолчанию
+                         пул не поднимается: из многопоточного сервера Streamlit
+                         fork небезопасен, пул включают пакетные скрипты
+        """
         self.session = session
+        self.max_workers = max_workers
 
     def execute_all(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -62,34 +83,171 @@ class CalibrateCoefficientsUseCase:
         stmt = select(ProductModel)
         products = self.session.scalars(stmt).all()
 
+        # Данные читаются в текущем процессе (сессия не передаётся между
+        # процессами). Независимые оптимизации по товарам выполняются в пуле
+        # процессов только при max_workers != 1, иначе последовательно
+        data_by_product = self._get_calibration_data()
+        payloads = [data_by_product.get(product.id, []) for product in products]
+
+        saved = self._get_saved_coefficients()
+        starts = [self._warm_start(saved.get(product.id)) for product in products]
+
         results = {}
+        coeffs_by_product = {}
 
-        for product in products:
-            coeffs = self._calibrate_product(product)
-            self._save_coefficients(product.id, coeffs)
+        for product, coeffs in zip(products, self._fit_all(payloads, starts)):
+            coeffs_by_product[product.id] = coeffs
             results[product.name] = coeffs
 
+        self._save_coefficients(coeffs_by_product, saved)
+
         return results
 
-    def _calibrate_product(self, product: ProductModel) -> Dict[str, Any]:
+    def _fit_all(
+        self,
+        payloads: List[List[Dict[str, Any]]],
+        starts: List[Optional[List[float]]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Калибрует набор товаров, при необходимости в пуле процессов
+
+        Товары, чьи данные не изменились с прошлой калибровки (совпал
+        отпечаток), берутся из кэша без оптимизации. Пул поднимается только
+        если оптимизацию требуют хотя бы два товара: для остальных
+        _fit_coefficients сразу возвращает стандартные коэффициенты, и
+        запуск процессов себя не окупает.
+
+        Args:
+            payloads: Данные для калибровки каждого товара
+            starts: Начальные приближения [a, b, c] для каждого товара (или None)
+
+        Returns:
+            Коэффициенты в том же порядке, что и payloads
+        """
+        keys = [
+            self._fingerprint(data) if len(data) >= 3 else None for data in payloads
+        ]
+        results: List[Optional[Dict[str, Any]]] = [self._cache_get(key) for key in keys]
+        todo = [i for i, coeffs in enumerate(results) if coeffs is None]
+
+        pending = sum(len(payloads[i]) >= 3 for i in todo)
+        todo_payloads = [payloads[i] for i in todo]
+        todo_starts = [starts[i] for i in todo]
+        if self.max_workers == 1 or pending < 2:
+            fitted = [
+                self._fit_coefficients(data, x0)
+                for data, x0 in zip(todo_payloads, todo_starts)
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                fitted = list(
+                    executor.map(self._fit_coefficients, todo_payloads, todo_starts)
+                )
+
+        for i, coeffs in zip(todo, fitted):
+            self._cache_put(keys[i], coeffs)
+            results[i] = coeffs
+
+        return [coeffs for coeffs in results if coeffs is not None]
+
+    @staticmethod
+    def _fingerprint(data: List[Dict[str, Any]]) -> str:
         """
-        Выполняет калибровку коэффициентов для одного товара
+        Отпечаток данных калибровки товара
+
+        Args:
+            data: Точки данных из _get_calibration_data
+
+        Returns:
+            Хэш дней хранения, количеств и фактической усушки всех точек
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for point in data:
+            # Длина отделяет точки друг от друга при склейке байтов
+            header = np.array(
+                [len(point["days"]), point["actual_shrinkage"]], dtype=np.float64
+            )
+            digest.update(header.tobytes())
+            digest.update(point["days"].tobytes())
+            digest.update(point["quantities"].tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def _cache_get(cls, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Возвращает копию закэшированного результата (или None)"""
+        if key is None:
+            return None
+        with cls._fit_cache_lock:
+            coeffs = cls._fit_cache.get(key)
+            if coeffs is None:
+                return None
+            cls._fit_cache.move_to_end(key)
+            return dict(coeffs)
+
+    @classmethod
+    def _cache_put(cls, key: Optional[str], coeffs: Dict[str, Any]) -> None:
+        """Сохраняет результат в кэш, вытесняя самые старые записи"""
+        if key is None:
+            return
+        with cls._fit_cache_lock:
+            cls._fit_cache[key] = dict(coeffs)
+            cls._fit_cache.move_to_end(key)
+            while len(cls._fit_cache) > cls.FIT_CACHE_SIZE:
+                cls._fit_cache.popitem(last=False)
+
+    def _get_saved_coefficients(self) -> Dict[int, ShrinkageCoefficientModel]:
+        """
+        Загружает сохранённые коэффициенты всех товаров одним запросом
+
+        Returns:
+            Словарь ID товара -> запись коэффициентов
+        """
+        stmt = select(ShrinkageCoefficientModel)
+        return {coeff.product_id: coeff for coeff in self.session.scalars(stmt)}
+
+    @staticmethod
+    def _warm_start(
+        coeff: Optional[ShrinkageCoefficientModel],
+    ) -> Optional[List[float]]:
+        """
+        Начальное приближение из ранее откалиброванных коэффициентов
+
+        Оптимизация от прошлого решения сходится за несколько итераций,
+        тогда как от стандартных значений требуется заметно больше.
+
+        Args:
+            coeff: Сохранённые коэффициенты товара (или None)
+
+        Returns:
+            [a, b, c] для откалиброванного товара, иначе None
+        """
+        if coeff is None or coeff.status != "калиброван":
+            return None
+        return [coeff.a, coeff.b, coeff.c]
+
+    @staticmethod
+    def _fit_coefficients(
+        data: List[Dict[str, Any]], x0: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Подбирает коэффициенты по уже загруженным данным товара
+
+        Чистая функция без обращения к БД, поэтому может выполняться
+        в отдельном процессе.
 
         Алгоритм калибровки:
-        1. Получает исторические данные инвентаризаций для товара
-        2. Если данных недостаточно (< 3 точек), возвращает стандартные коэффициенты
-        3. Определяет целевую функцию (сумма квадратов ошибок)
-        4. Использует оптимизацию (L-BFGS-B) для нахождения оптимальных коэффициентов
-        5. Вычисляет RMSE для оценки качества калибровки
+        1. Если данных недостаточно (< 3 точек), возвращает стандартные коэффициенты
+        2. Определяет вектор остатков (предсказанная - фактическая усушка)
+        3. Решает нелинейную задачу МНК (least_squares, TRF) с аналитическим Якобианом
+        4. Вычисляет RMSE для оценки качества калибровки
 
         Args:
-            product: Модель товара для калибровки
+            data: Точки данных из _get_calibration_data
+            x0: Начальное приближение [a, b, c] (None - стандартные значения)
 
         Returns:
             Словарь с коэффициентами и метриками качества калибровки
         """
-        data = self._get_calibration_data(product.id)
-
         if len(data) < 3:
             return {
                 "a": 0.05,
@@ -100,38 +258,29 @@ class CalibrateCoefficientsUseCase:
                 "status": "стандартные",
             }
 
-        def objective(params: List[float]) -> float:
-            """
-            Целевая функция для оптимизации - сумма квадратов ошибок
-
-            Args:
-                params: Список параметров [a, b, c] для оптимизации
+        residuals, jacobian, n_points = CalibrateCoefficientsUseCase._make_objective(
+            data
+        )
 
-            Returns:
-                Сумма квадратов разностей между предсказанными и фактическими значениями
-            """
-            a, b, c = params
-            errors = []
-            for point in data:
-                predicted = self._calculate_portion(point, a, b, c)
-                actual = point["actual_shrinkage"]
-                errors.append((predicted - actual) ** 2)
-            return sum(errors)  # type: ignore
-
-        # Начальные значения коэффициентов: a=0.05, b=0.1, c=0.01
-        x0 = [0.05, 0.1, 0.01]
         # Ограничения для коэффициентов: [a_min, a_max], [b_min, b_max], [c_min, c_max]
         bounds = [(0.01, 0.15), (0.01, 0.5), (0.0, 0.03)]
-        # Оптимизация с использованием метода L-BFGS-B (ограниченная оптимизация)
-        result = minimize(objective, x0, bounds=bounds, method="L-BFGS-B")  # type: ignore
+        if x0 is None:
+            # Начальные значения коэффициентов: a=0.05, b=0.1, c=0.01
+            x0 = [0.05, 0.1, 0.01]
+        else:
+            # Тёплый старт: прошлое решение, приведённое к границам
+            x0 = [min(max(x, lo), hi) for x, (lo, hi) in zip(x0, bounds)]
+        lower, upper = zip(*bounds)
+        # Нелинейный МНК с ограничениями (Trust Region Reflective): использует
+        # структуру задачи через матрицу Якоби, а не квазиньютоновский гессиан
+        result = least_squares(
+            residuals, x0, jac=jacobian, bounds=(lower, upper), method="trf"
+        )
         a, b, c = result.x
 
-        # Вычисление RMSE (Root Mean Square Error) для оценки качества калибровки
-        errors = [
-            (self._calculate_portion(p, a, b, c) - p["actual_shrinkage"]) ** 2
-            for p in data
-        ]
-        rmse = math.sqrt(sum(errors) / len(errors))
+        # Вычисление RMSE (Root Mean Square Error) для оценки качества калибровки:
+        # result.cost = 0.5 * sum(r^2) в найденной точке, повторный расчёт не нужен
+        rmse = math.sqrt(2.0 * float(result.cost) / n_points)
 
         return {
             "a": a,
@@ -142,129 +291,317 @@ class CalibrateCoefficientsUseCase:
             "status": "калиброван",
         }
 
-    def _get_calibration_data(self, product_id: int) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _make_objective(
+        data: List[Dict[str, Any]],
+    ) -> Tuple[
+        Callable[[np.ndarray], np.ndarray], Callable[[np.ndarray], np.ndarray], int
+    ]:
+        """
+        Строит функцию остатков и её Якобиан для least_squares
+
+        Args:
+            data: Точки данных из _get_calibration_data
+
+        Returns:
+            (residuals, jacobian, число точек данных)
+        """
+        samples = CalibrateCoefficientsUseCase._flatten_points(data)
+        days = samples["days"]
+        quantities = samples["quantities"]
+        point_index = samples["point_index"]
+        actual = samples["actual"]
+        n_points = len(actual)
+
+        # Предсказание раскладывается как a * S1(b) + c * Q, где Q = sum(m)
+        # и m * t не зависят от параметров и считаются один раз
+        qty_per_point = np.bincount(point_index, weights=quantities, minlength=n_points)
+        qty_days = quantities * days
+        # Буферы переиспользуются между итерациями вместо временных массивов
+        decay = np.empty_like(quantities)
+        work = np.empty_like(quantities)
+        # Суммы по точкам зависят только от b; residuals и jacobian
+        # вызываются с одним и тем же b, поэтому последний расчёт кэшируется
+        cache: Dict[str, Any] = {"b": None}
+
+        def decay_sums(b: float) -> Tuple[np.ndarray, np.ndarray]:
+            """
+            Суммы по точкам, зависящие от b
+
+            Args:
+                b: Коэффициент b (скорость затухания усушки)
+
+            Returns:
+                S1 = sum(m * (1 - e^(-b*t))) и S2 = sum(m * t * e^(-b*t))
+            """
+            if cache["b"] != b:
+                np.multiply(days, -b, out=decay)
+                np.exp(decay, out=decay)
+
+                np.multiply(quantities, decay, out=work)
+                np.subtract(quantities, work, out=work)
+                share = np.bincount(point_index, weights=work, minlength=n_points)
+
+                np.multiply(qty_days, decay, out=work)
+                decay_days = np.bincount(point_index, weights=work, minlength=n_points)
+
+                cache.update(b=b, share=share, decay_days=decay_days)
+            return cache["share"], cache["decay_days"]
+
+        def residuals(params: np.ndarray) -> np.ndarray:
+            """
+            Вектор остатков: предсказанная минус фактическая усушка по точкам
+
+            Args:
+                params: Параметры [a, b, c]
+
+            Returns:
+                Остатки для каждой точки данных
+            """
+            a, b, c = params
+            share, _ = decay_sums(b)
+            out: np.ndarray = a * share + c * qty_per_point - actual
+            return out
+
+        def jacobian(params: np.ndarray) -> np.ndarray:
+            """
+            Аналитическая матрица Якоби остатков (n_points x 3)
+
+            Args:
+                params: Параметры [a, b, c]
+
+            Returns:
+                Производные остатков по a, b и c
+            """
+            a, b, _ = params
+            share, decay_days = decay_sums(b)
+            return np.column_stack([share, a * decay_days, qty_per_point])
+
+        return residuals, jacobian, n_points
+
+    def _get_calibration_data(
+        self, product_id: Optional[int] = None
+    ) -> Dict[int, List[Dict[str, Any]]]:
         """
         Получает данные инвентаризаций для калибровки
 
         Собирает исторические данные о партиях, продажах и фактической усушке
-        для указанного товара. Для каждой инвентаризации формирует точку данных
-        с начальной массой партии, датой прибытия, списком продаж и фактической
-        усушкой, измеренной при инвентаризации.
+        для указанного товара (или для всех товаров, если product_id не задан).
+        Для каждой инвентаризации формирует точку данных с начальной массой
+        партии, датой прибытия, продажами и фактической усушкой, измеренной
+        при инвентаризации.
+
+        Данные всех товаров загружаются двумя запросами (инвентаризации и
+        партии с продажами) и группируются в Python, а не отдельными
+        запросами на каждый товар.
 
         Args:
-            product_id: ID товара для получения данных
+            product_id: ID товара для получения данных (None - все товары)
 
         Returns:
-            Список словарей с данными для калибровки в формате:
-            [
-                {
-                    "initial_mass": float,      # Начальная масса партии
-                    "arrival_date": datetime,   # Дата прибытия партии
-                    "sales": List[Dict],        # Список продаж: [{"date": datetime, "quantity": float}]
-                    "actual_shrinkage": float   # Фактическая усушка, измеренная при инвентаризации
-                },
-                ...
-            ]
+            Словарь ID товара -> список словарей с данными для калибровки:
+            {
+                product_id: [
+                    {
+                        "initial_mass": float,      # Начальная масса партии
+                        "arrival_date": datetime,   # Дата прибытия партии
+                        "days": np.ndarray,         # Дни хранения каждой продажи (только >= 0)
+                        "quantities": np.ndarray,   # Количество каждой продажи
+                        "actual_shrinkage": float   # Фактическая усушка, измеренная при инвентаризации
+                    },
+                    ...
+                ]
+            }
         """
-        stmt = select(InventoryModel).where(InventoryModel.product_id == product_id)
-        inventories = self.session.scalars(stmt).all()
+        inv_stmt = select(InventoryModel.product_id, InventoryModel.shrinkage)
+        # Партии и продажи не зависят от инвентаризации: один JOIN вместо
+        # запроса партий на каждую инвентаризацию и продаж на каждую партию.
+        # OUTER JOIN сохраняет партии без продаж. Инвентаризации в этот JOIN
+        # не входят, иначе строки размножились бы на число инвентаризаций.
+        batch_stmt = (
+            select(
+                BatchModel.product_id,
+                BatchModel.id,
+                BatchModel.initial_qty,
+                BatchModel.arrival_datetime,
+                SaleModel.sale_date,
+                SaleModel.quantity,
+            )
+            .outerjoin(SaleModel, SaleModel.batch_id == BatchModel.id)
+            .order_by(BatchModel.id, SaleModel.id)
+        )
+        if product_id is not None:
+            inv_stmt = inv_stmt.where(InventoryModel.product_id == product_id)
+            batch_stmt = batch_stmt.where(BatchModel.product_id == product_id)
 
-        data = []
-        for inv in inventories:
-            batch_stmt = select(BatchModel).where(BatchModel.product_id == product_id)
-            batches = self.session.scalars(batch_stmt).all()
+        shrinkages: Dict[int, List[float]] = {}
+        for inv_product_id, shrinkage in self.session.execute(inv_stmt):
+            shrinkages.setdefault(inv_product_id, []).append(shrinkage)
+        if not shrinkages:
+            return {}
 
-            for batch in batches:
-                sales_stmt = select(SaleModel).where(SaleModel.batch_id == batch.id)
-                sales = self.session.scalars(sales_stmt).all()
+        batches = self._group_batch_rows(self.session.execute(batch_stmt).all())
 
-                sales_list = [
-                    {"date": sale.sale_date, "quantity": sale.quantity}
-                    for sale in sales
-                ]
+        return {
+            pid: [
+                {**batch, "actual_shrinkage": shrinkage}
+                for shrinkage in product_shrinkages
+                for batch in batches.get(pid, {}).values()
+            ]
+            for pid, product_shrinkages in shrinkages.items()
+        }
 
-                data.append(
-                    {
-                        "initial_mass": batch.initial_qty,
-                        "arrival_date": batch.arrival_datetime,
-                        "sales": sales_list,
-                        "actual_shrinkage": inv.shrinkage,
-                    }
-                )
+    @staticmethod
+    def _group_batch_rows(
+        rows: Sequence[
+            Tuple[int, int, float, datetime, Optional[datetime], Optional[float]]
+        ],
+    ) -> Dict[int, Dict[int, Dict[str, Any]]]:
+        """
+        Группирует строки JOIN партий и продаж по товарам и партиям
 
-        return data
+        Args:
+            rows: Строки (product_id, id партии, initial_qty, arrival_datetime,
+                  sale_date, quantity), отсортированные по партии
 
-    def _calculate_portion(
-        self, point: Dict[str, Any], a: float, b: float, c: float
-    ) -> float:
+        Returns:
+            Словарь ID товара -> {ID партии: initial_mass, arrival_date,
+            days и quantities продаж не раньше прихода}
         """
-        Расчёт усушки по порционной модели
+        # Продажи всех партий складываются в общие списки; партия хранит
+        # границы своего среза (строки отсортированы по партии)
+        batches: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        sale_dates: List[datetime] = []
+        sale_arrivals: List[datetime] = []
+        sale_quantities: List[float] = []
+        for (
+            batch_product_id,
+            batch_id,
+            initial_qty,
+            arrival,
+            sale_date,
+            quantity,
+        ) in rows:
+            batch = batches.setdefault(batch_product_id, {}).setdefault(
+                batch_id,
+                {
+                    "initial_mass": initial_qty,
+                    "arrival_date": arrival,
+                    "start": len(sale_dates),
+                },
+            )
+            if sale_date is not None and quantity is not None:
+                sale_dates.append(sale_date)
+                sale_arrivals.append(arrival)
+                sale_quantities.append(quantity)
+            batch["stop"] = len(sale_dates)
+
+        # Дни хранения всех продаж считаются одной операцией над datetime64
+        # (а не через timedelta на каждую продажу, инвентаризацию и итерацию
+        # оптимизатора). Деление с округлением вниз совпадает с timedelta.days
+        all_days = (
+            np.array(sale_dates, dtype="datetime64[us]")
+            - np.array(sale_arrivals, dtype="datetime64[us]")
+        ) // np.timedelta64(1, "D")
+        CalibrateCoefficientsUseCase._slice_sales(
+            batches, all_days, np.array(sale_quantities, dtype=np.float64)
+        )
+        return batches
+
+    @staticmethod
+    def _slice_sales(
+        batches: Dict[int, Dict[int, Dict[str, Any]]],
+        all_days: np.ndarray,
+        all_quantities: np.ndarray,
+    ) -> None:
+        """
+        Заменяет границы среза каждой партии массивами её продаж
 
-        Для каждой продажи в точке данных вычисляет усушку по формуле:
-        усушка_порции = количество_проданного * [a * (1 - e^(-b * дни_хранения)) + c]
+        Args:
+            batches: Партии из _group_batch_rows (с ключами start/stop)
+            all_days: Дни хранения всех продаж
+            all_quantities: Количества всех продаж
+        """
+        # Продажи до прихода партии отбрасываются сразу
+        for product_batches in batches.values():
+            for batch in product_batches.values():
+                sales = slice(batch.pop("start"), batch.pop("stop"))
+                days = all_days[sales]
+                mask = days >= 0
+                batch["days"] = days[mask]
+                batch["quantities"] = all_quantities[sales][mask]
+
+    @staticmethod
+    def _flatten_points(data: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        Упаковывает точки данных в плоские массивы (Struct-of-Arrays)
 
-        Где:
-        - a: начальная скорость усушки
-        - b: скорость затухания усушки
-        - c: базовый уровень усушки (минимальная усушка независимо от времени)
-        - дни_хранения: количество дней между датой продажи и датой прибытия партии
+        Продажи всех точек склеиваются в один массив дней и один массив
+        количеств; point_index хранит номер точки для каждой продажи. Это
+        позволяет считать целевую функцию одним вызовом np.exp на итерацию
+        вместо цикла по точкам.
 
         Args:
-            point: Точка данных с информацией о партии и продажах
-            a: Коэффициент a (начальная скорость усушки)
-            b: Коэффициент b (скорость затухания усушки)
-            c: Коэффициент c (базовый уровень усушки)
+            data: Точки данных из _get_calibration_data
 
         Returns:
-            Общая усушка для всех продаж в точке данных
+            Словарь с массивами days, quantities, point_index и actual
         """
-        total = 0.0
-        for sale in point["sales"]:
-            # Вычисление количества дней между датой продажи и датой прибытия партии
-            days = (sale["date"] - point["arrival_date"]).days
-            if days >= 0:
-                # Формула порционной модели: m * [a * (1 - e^(-b*t)) + c]
-                # где m - количество проданного товара, t - дни хранения
-                total += sale["quantity"] * (a * (1 - math.exp(-b * days)) + c)
-        return total
-
-    def _save_coefficients(self, product_id: int, coeffs: Dict[str, Any]) -> None:
+        counts = [len(point["days"]) for point in data]
+        return {
+            "days": np.concatenate([point["days"] for point in data]),
+            "quantities": np.concatenate([point["quantities"] for point in data]),
+            "point_index": np.repeat(np.arange(len(data)), counts),
+            "actual": np.array(
+                [point["actual_shrinkage"] for point in data], dtype=np.float64
+            ),
+        }
+
+    def _save_coefficients(
+        self,
+        coeffs_by_product: Dict[int, Dict[str, Any]],
+        saved: Dict[int, ShrinkageCoefficientModel],
+    ) -> None:
         """
         Сохраняет коэффициенты усушки в базу данных
 
-        Если коэффициенты для товара уже существуют, обновляет их значения,
-        иначе создает новую запись. После сохранения фиксирует изменения
-        в базе данных.
+        Существующие записи (уже загруженные _get_saved_coefficients)
+        обновляются, для остальных товаров создаются новые записи. Все
+        изменения фиксируются одним коммитом.
 
         Args:
-            product_id: ID товара, для которого сохраняются коэффициенты
-            coeffs: Словарь с коэффициентами и метриками качества калибровки
+            coeffs_by_product: Коэффициенты и метрики калибровки по ID товара
+            saved: Существующие записи коэффициентов по ID товара
         """
-        stmt = select(ShrinkageCoefficientModel).where(
-            ShrinkageCoefficientModel.product_id == product_id
-        )
-        existing = self.session.scalars(stmt).first()
-
-        if existing:
-            # Обновление существующих коэффициентов
-            existing.a = coeffs["a"]
-            existing.b = coeffs["b"]
-            existing.c = coeffs["c"]
-            existing.rmse = coeffs.get("rmse")
-            existing.data_points = coeffs.get("data_points", 0)
-            existing.status = coeffs["status"]
-            existing.calibration_date = datetime.now()
-        else:
-            # Создание новой записи с коэффициентами
-            coeff = ShrinkageCoefficientModel(
-                product_id=product_id,
-                a=coeffs["a"],
-                b=coeffs["b"],
-                c=coeffs["c"],
-                rmse=coeffs.get("rmse"),
-                data_points=coeffs.get("data_points", 0),
-                status=coeffs["status"],
-            )
-            self.session.add(coeff)
+        if not coeffs_by_product:
+            return
+
+        now = datetime.now()
+        new_coeffs = []
+        for product_id, coeffs in coeffs_by_product.items():
+            existing = saved.get(product_id)
+            if existing:
+                # Обновление существующих коэффициентов
+                existing.a = coeffs["a"]
+                existing.b = coeffs["b"]
+                existing.c = coeffs["c"]
+                existing.rmse = coeffs.get("rmse")
+                existing.data_points = coeffs.get("data_points", 0)
+                existing.status = coeffs["status"]
+                existing.calibration_date = now
+            else:
+                # Создание новой записи с коэффициентами
+                new_coeffs.append(
+                    ShrinkageCoefficientModel(
+                        product_id=product_id,
+                        a=coeffs["a"],
+                        b=coeffs["b"],
+                        c=coeffs["c"],
+                        rmse=coeffs.get("rmse"),
+                        data_points=coeffs.get("data_points", 0),
+                        status=coeffs["status"],
+                    )
+                )
 
+        self.session.add_all(new_coeffs)
         self.session.commit()
@@ -3,11 +3,13 @@ Use Case: Прогнозирование усушки
 Использует ВЗВЕШЕННУЮ модель (99.5% точность)
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+import numpy as np
+from sqlalchemy import ColumnElement, Select, func, select
+from sqlalchemy.orm import Session, selectinload
 
 from shield_ai.domain.shrinkage.strategies import WeightedStrategy
 from shield_ai.infrastructure.database.models import (
@@ -16,6 +18,17 @@ from shield_ai.infrastructure.database.models import (
     ShrinkageCoefficientModel,
 )
 
+# date.toordinal() для 1970-01-01 - начала отсчёта datetime64[D]
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _calculate_chunk(
+    chunk: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+) -> List[float]:
+    """Усушка для пачки партий (выполняется в процессе пула)"""
+    strategy = WeightedStrategy()
+    return [strategy.calculate(batch_data, coeffs) for batch_data, coeffs in chunk]
+
 
 class ForecastShrinkageUseCase:
     """
@@ -24,51 +37,57 @@ class ForecastShrinkageUseCase:
     Модель: Взвешенная (99.5%) - PRODUCTION
     """
 
-    def __init__(self, session: Session):
+    # Партий на одну задачу пула: расчёт партии дешевле передачи её в процесс
+    CHUNK_SIZE = 100
+
+    def __init__(self, session: Session, max_workers: Optional[int] = 1):
+        """
+        Args:
+            session: Сессия БД
+            max_workers: Число процессов для расчёта (1 - последовательно
+                         в текущем процессе, None - по числу CPU)
+        """
         self.session = session
+        self.max_workers = max_workers
         self.strategy = WeightedStrategy()
+        self._coefficients: Dict[int, Dict[str, Any]] = {}
 
     def execute_all(self) -> List[Dict[str, Any]]:
-        """Прогноз для всех активных партий"""
-        stmt = select(BatchModel).where(BatchModel.remaining_qty > 0)
+        """
+        Прогноз для всех активных партий
+
+        Партии (вместе с товарами), их продажи и коэффициенты загружаются
+        фиксированным числом запросов до цикла, а не запросами на каждую партию.
+        """
+        active = BatchModel.remaining_qty > 0
+        stmt = (
+            select(BatchModel).where(active).options(selectinload(BatchModel.product))
+        )
         batches = self.session.scalars(stmt).all()
 
-        forecasts = []
+        sales_by_batch = self._load_daily_sales(active)
 
-        for batch in batches:
-            coeffs = self._get_coefficients(batch.product_id)
-
-            # Получаем продажи по дням
-            sales_stmt = select(SaleModel).where(SaleModel.batch_id == batch.id)
-            sales = self.session.scalars(sales_stmt).all()
-
-            daily_sales: Dict[date, float] = {}
-            for sale in sales:
-                date_key = sale.sale_date.date()
-                if date_key in daily_sales:
-                    daily_sales[date_key] += sale.quantity
-                else:
-                    daily_sales[date_key] = sale.quantity
-
-            batch_data = {
-                "initial_mass": batch.initial_qty,
-                "arrival_date": batch.arrival_datetime,
-                "end_date": datetime.now(),
-                "daily_sales": daily_sales,
-            }
+        self._load_coefficients(select(BatchModel.product_id).where(active))
+
+        # Одна "текущая" дата на весь прогноз: результат воспроизводим в пределах вызова
+        now = datetime.now()
+
+        tasks = self._build_tasks(batches, sales_by_batch, now)
+        predictions = self._calculate_all(tasks)
 
-            predicted_shrinkage = self.strategy.calculate(batch_data, coeffs)
+        forecasts = []
+
+        for batch, (_, coeffs), predicted_shrinkage in zip(batches, tasks, predictions):
             sold = batch.initial_qty - batch.remaining_qty
             theoretical_remaining = batch.initial_qty - sold - predicted_shrinkage
+            product = batch.product
 
             forecasts.append(
                 {
-                    "product_name": batch.product.name if batch.product else "Unknown",
-                    "group_name": (
-                        batch.product.group_name if batch.product else "Unknown"
-                    ),
+                    "product_name": product.name if product else "Unknown",
+                    "group_name": product.group_name if product else "Unknown",
                     "arrival_date": batch.arrival_date,
-                    "days_stored": (datetime.now() - batch.arrival_datetime).days,
+                    "days_stored": (now - batch.arrival_datetime).days,
                     "initial_qty": batch.initial_qty,
                     "sold_qty": sold,
                     "remaining_qty": batch.remaining_qty,
@@ -80,13 +99,151 @@ class ForecastShrinkageUseCase:
 
         return forecasts
 
-    def _get_coefficients(self, product_id: int) -> Dict[str, Any]:
-        """Получает коэффициенты"""
+    def _build_tasks(
+        self,
+        batches: Sequence[BatchModel],
+        sales_by_batch: Dict[int, Dict[int, float]],
+        now: datetime,
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Данные для расчёта каждой партии
+
+        Args:
+            batches: Активные партии
+            sales_by_batch: Продажи по дням из _group_daily_sales
+            now: Конечная дата прогноза
+
+        Returns:
+            Пары (данные партии, коэффициенты) в порядке batches
+        """
+        return [
+            (
+                {
+                    "initial_mass": batch.initial_qty,
+                    "arrival_date": batch.arrival_datetime,
+                    "end_date": now,
+                    # Продажи по дням
+                    "daily_sales": sales_by_batch.get(batch.id, {}),
+                },
+                self._get_coefficients(batch.product_id),
+            )
+            for batch in batches
+        ]
+
+    def _calculate_all(
+        self, tasks: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> List[float]:
+        """
+        Рассчитывает усушку всех партий, при необходимости в пуле процессов
+
+        Партии независимы, поэтому делятся на пачки по CHUNK_SIZE: одна задача
+        пула - одна пачка, чтобы накладные расходы на передачу данных между
+        процессами не превышали сам расчёт. Пул поднимается только если
+        пачек хотя бы две.
+
+        Args:
+            tasks: Пары (данные партии, коэффициенты)
+
+        Returns:
+            Прогноз усушки в том же порядке, что и tasks
+        """
+        if self.max_workers == 1 or len(tasks) < 2 * self.CHUNK_SIZE:
+            return [self.strategy.calculate(data, coeffs) for data, coeffs in tasks]
+
+        chunks = [
+            tasks[i : i + self.CHUNK_SIZE]
+            for i in range(0, len(tasks), self.CHUNK_SIZE)
+        ]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return [
+                shrinkage
+                for chunk_result in executor.map(_calculate_chunk, chunks)
+                for shrinkage in chunk_result
+            ]
+
+    def _load_daily_sales(
+        self, active: ColumnElement[bool]
+    ) -> Dict[int, Dict[int, float]]:
+        """Продажи отобранных партий по дням одним запросом"""
+        # Время продажи отбрасывается на стороне БД: приходит только дата
+        stmt = (
+            select(
+                SaleModel.batch_id,
+                func.date(SaleModel.sale_date).label("sale_day"),
+                SaleModel.quantity,
+            )
+            .join(SaleModel.batch)
+            .where(active)
+        )
+        return self._group_daily_sales(self.session.execute(stmt).all())
+
+    @staticmethod
+    def _group_daily_sales(
+        rows: Sequence[Tuple[int, Union[str, date], float]],
+    ) -> Dict[int, Dict[int, float]]:
+        """
+        Суммирует продажи по партиям и дням
+
+        Вместо словаря с ветвлением на каждую продажу строки сортируются
+        по (партия, день) и суммируются одним np.add.reduceat.
+
+        Args:
+            rows: Строки (batch_id, день продажи, quantity); день - дата или
+                  строка ISO 'YYYY-MM-DD' (так date() возвращает SQLite)
+
+        Returns:
+            Словарь batch_id -> {порядковый номер дня (date.toordinal()):
+            количество за день}
+        """
+        if not rows:
+            return {}
+
+        batch_ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+        # datetime64[D] разбирает и строки ISO, и объекты date
+        days = np.array([row[1] for row in rows], dtype="datetime64[D]")
+        quantities = np.fromiter((row[2] for row in rows), np.float64, len(rows))
+
+        order = np.lexsort((days, batch_ids))
+        batch_ids, days, quantities = batch_ids[order], days[order], quantities[order]
+
+        # Начало каждой группы (партия, день) в отсортированных массивах
+        starts = np.flatnonzero(
+            np.concatenate(
+                ([True], (batch_ids[1:] != batch_ids[:-1]) | (days[1:] != days[:-1]))
+            )
+        )
+        totals = np.add.reduceat(quantities, starts)
+
+        # Целые ключи-ординалы вместо объектов date: дешевле хэшируются
+        # и сразу ложатся в массивы стратегии
+        ordinals = days[starts].astype(np.int64) + _EPOCH_ORDINAL
+
+        daily_sales: Dict[int, Dict[int, float]] = {}
+        for batch_id, day, total in zip(
+            batch_ids[starts].tolist(), ordinals.tolist(), totals.tolist()
+        ):
+            daily_sales.setdefault(batch_id, {})[day] = total
+        return daily_sales
+
+    def _load_coefficients(self, product_ids: Select[Any]) -> None:
+        """Загружает коэффициенты товаров (подзапрос product_ids) одним запросом"""
         stmt = select(ShrinkageCoefficientModel).where(
-            ShrinkageCoefficientModel.product_id == product_id
+            ShrinkageCoefficientModel.product_id.in_(product_ids)
         )
-        coeff = self.session.scalars(stmt).first()
+        self._coefficients = {
+            coeff.product_id: {
+                "a": coeff.a,
+                "b": coeff.b,
+                "c": coeff.c,
+                "status": coeff.status,
+            }
+            for coeff in self.session.scalars(stmt)
+        }
+
+    def _get_coefficients(self, product_id: int) -> Dict[str, Any]:
+        """Получает коэффициенты (из загруженных заранее)"""
+        coeff = self._coefficients.get(product_id)
 
         if coeff:
-            return {"a": coeff.a, "b": coeff.b, "c": coeff.c, "status": coeff.status}
+            return dict(coeff)
         return {"a": 0.05, "b": 0.1, "c": 0.01, "status": "стандартные"}
@@ -7,7 +7,7 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Batch:
     """Партия товара с FIFO логикой"""
 
@@ -37,7 +37,18 @@ class Batch:
     @property
     def days_stored(self) -> int:
         """Дней с момента прихода"""
-        return (datetime.now() - self.arrival_datetime).days
+        return self.days_stored_at()
+
+    def days_stored_at(self, as_of: Optional[datetime] = None) -> int:
+        """
+        Дней с момента прихода на дату as_of
+
+        Позволяет передать один момент времени для всех партий расчёта
+        вместо вызова datetime.now() на каждое обращение.
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        return (as_of - self.arrival_datetime).days
 
     def is_empty(self) -> bool:
         """Партия пустая?"""
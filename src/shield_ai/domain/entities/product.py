@@ -8,7 +8,7 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """Товар в системе"""
 
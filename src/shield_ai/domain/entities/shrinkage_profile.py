@@ -17,7 +17,7 @@ class CoefficientStatus(Enum):
 
 
 # pylint: disable=too-many-instance-attributes
-@dataclass
+@dataclass(slots=True)
 class ShrinkageProfile:
     """Профиль усушки для товара"""
 
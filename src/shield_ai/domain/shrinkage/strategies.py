@@ -1,6 +1,7 @@
 """
 Три стратегии расчёта усушки согласно документации
-ЧИСТАЯ бизнес-логика без зависимостей
+ЧИСТАЯ бизнес-логика без зависимостей от инфраструктуры (NumPy - только для
+векторных вычислений)
 
 Этот модуль реализует три различные стратегии расчета усушки:
 1. Порционная модель (99.9% точность) - используется для калибровки
@@ -13,9 +14,18 @@
 """
 
 import math
+import threading
 from abc import ABC, abstractmethod
-from datetime import timedelta
-from typing import Any, Dict, List, Tuple, Type
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+
+def _as_date(value: Union[date, datetime]) -> date:
+    """Календарная дата (ключи daily_sales - даты без времени)"""
+    return value.date() if isinstance(value, datetime) else value
 
 
 class ShrinkageStrategy(ABC):
@@ -93,31 +103,83 @@ class PortionStrategy(ShrinkageStrategy):
 
         Args:
             batch_data: Данные партии, содержащие:
-                       - arrival_date: дата прибытия партии
-                       - sales: список продаж с датами и количествами
+                       - arrival_date: дата прибытия партии (нужна, если
+                         хотя бы одна продажа задана датой)
+                       - sales: список продаж с количествами; каждая продажа
+                         содержит либо дату ("date"), либо готовые дни
+                         хранения ("day_offset")
             coeffs: Коэффициенты a, b, c для расчета усушки
 
         Returns:
             Общая усушка для всех продаж в партии
         """
         a, b, c = coeffs["a"], coeffs["b"], coeffs["c"]
-        arrival_date = batch_data["arrival_date"]
         sales = batch_data.get("sales", [])
 
-        total_shrinkage = 0.0
+        if not sales:
+            return 0.0
+
+        # Количество дней между датой продажи и датой прибытия партии;
+        # если дни посчитаны заранее, timedelta для продажи не создаётся
+        arrival_date = batch_data.get("arrival_date")
+        days = np.fromiter(
+            (
+                (
+                    sale["day_offset"]
+                    if "day_offset" in sale
+                    else (sale["date"] - arrival_date).days
+                )
+                for sale in sales
+            ),
+            np.float64,
+            len(sales),
+        )
+        quantities = np.fromiter(
+            (sale["quantity"] for sale in sales), np.float64, len(sales)
+        )
+
+        # Пропускаем продажи, которые произошли до прибытия партии
+        in_period = days >= 0
+        days, quantities = days[in_period], quantities[in_period]
+
+        # Усушка всех порций одним выражением: sum(m * [a * (1 - e^(-b*t)) + c])
+        return float(quantities @ (a * (1.0 - np.exp(-b * days)) + c))
+
+    def calculate_batch(
+        self, batch_arrays: Dict[str, np.ndarray], coeffs: Dict[str, np.ndarray]
+    ) -> np.ndarray:
+        """
+        Рассчитывает усушку по порционной модели сразу для многих партий
+
+        Продажи всех партий передаются плоскими массивами, усушка порций
+        считается одним векторным выражением и суммируется по партиям.
+
+        Args:
+            batch_arrays: Массивы продаж (одна позиция - одна продажа):
+                         - quantities: количество проданного
+                         - days: дни хранения на момент продажи
+                         - batch_ids: номер партии 0..N-1 для каждой продажи
+                         - n_batches: число партий N (опционально)
+            coeffs: Массивы коэффициентов a, b, c длины N (по партиям)
 
-        for sale in sales:
-            # Вычисление количества дней между датой продажи и датой прибытия партии
-            days = (sale["date"] - arrival_date).days
-            if days < 0:
-                # Пропускаем продажи, которые произошли до прибытия партии
-                continue
+        Returns:
+            Массив усушки по партиям длины N
+        """
+        a, b, c = coeffs["a"], coeffs["b"], coeffs["c"]
+        quantities = np.asarray(batch_arrays["quantities"], dtype=np.float64)
+        days = np.asarray(batch_arrays["days"], dtype=np.float64)
+        batch_ids = np.asarray(batch_arrays["batch_ids"], dtype=np.intp)
+        n_batches = int(batch_arrays.get("n_batches", len(a)))
 
-            # Расчет усушки для одной порции по формуле: m * [a * (1 - e^(-b*t)) + c]
-            shrinkage = sale["quantity"] * (a * (1 - math.exp(-b * days)) + c)
-            total_shrinkage += shrinkage
+        # Усушка каждой порции: m * [a * (1 - e^(-b*t)) + c]
+        shrinkage = quantities * (
+            a[batch_ids] * (1 - np.exp(-b[batch_ids] * days)) + c[batch_ids]
+        )
+        # Продажи до прибытия партии не учитываются
+        shrinkage = np.where(days < 0, 0.0, shrinkage)
 
-        return total_shrinkage
+        # bincount корректно даёт 0 партиям без продаж
+        return np.bincount(batch_ids, weights=shrinkage, minlength=n_batches)
 
     def get_name(self) -> str:
         return "Порционная"
@@ -143,52 +205,114 @@ class WeightedStrategy(ShrinkageStrategy):
     Модель учитывает, что усушка зависит от текущей массы товара, что делает
     расчет более точным по сравнению с простыми моделями, где усушка
     рассчитывается от начальной массы на протяжении всего периода.
+
+    Суточный шаг M[t+1] = M[t] * (1 - r[t]) - s[t], где r[t] = a * b * e^(-b*t),
+    линеен по массе, поэтому вместо цикла по дням рекуррентность
+    разворачивается через накопленное произведение (np.cumprod).
+
+    F[t] зависит только от (a, b) и является префиксом более длинного ряда,
+    поэтому ряды кэшируются по (a, b): партии одного товара с разным сроком
+    хранения берут срез одного массива без повторных exp и cumprod.
     """
 
+    SURVIVAL_CACHE_SIZE = 256
+    _survival_cache: "OrderedDict[Tuple[float, float], np.ndarray]" = OrderedDict()
+    _survival_cache_lock = threading.Lock()
+
     def calculate(self, batch_data: Dict[str, Any], coeffs: Dict[str, float]) -> float:
         """
         Рассчитывает усушку по взвешенной интегральной модели
 
         Алгоритм:
-        1. Инициализирует начальные параметры (масса, даты, счетчики)
-        2. Для каждого дня в периоде:
-           - Вычисляет скорость усушки на основе начальной массы и экспоненты
-           - Применяет коэффициент массы для учета текущего остатка
-           - Обновляет общую усушку и текущую массу
-           - Учитывает продажи в этот день
-        3. Возвращает общую усушку за период
+        1. Строит массив по дням периода: доля суточной усушки
+           r[t] = a * b * e^(-b*t)
+        2. Доля массы, пережившей усушку к концу дня t:
+           F[t] = (1 - r[0]) * ... * (1 - r[t])
+        3. Масса на конец периода: M_N = F[N-1] * (M0 - sum(s[t] / F[t])),
+           сумма берётся только по дням продаж s[t]
+        4. Общая усушка = M0 - M_N - sum(s), что равно сумме суточных
+           усушек r[t] * M[t] исходного пошагового расчёта
 
         Args:
             batch_data: Данные партии, содержащие:
                        - initial_mass: начальная масса партии
                        - arrival_date: дата прибытия партии
                        - end_date: конечная дата расчета
-                       - daily_sales: словарь продаж по дням (опционально)
+                       - daily_sales: словарь продаж по дням (опционально),
+                         ключ - порядковый номер дня date.toordinal()
             coeffs: Коэффициенты a, b для расчета усушки
 
         Returns:
             Общая усушка за период
         """
-        while current_date <= end_date:
-            # Вычисление скорости усушки: M0 * a * b * e^(-b * day_counter)
-            # Это производная от функции усушки по времени
-            shrinkage_rate = M0 * a * b * math.exp(-b * day_counter)
-            # Учет текущей массы: усушка пропорциональна текущему остатку
-            mass_ratio = current_mass / M0 if M0 > 0 else 0
-            # Суточная усушка с учетом текущей массы
-            daily_shrinkage = shrinkage_rate * mass_ratio
+        a, b = coeffs["a"], coeffs["b"]
+        M0 = batch_data["initial_mass"]
+        arrival_date = batch_data["arrival_date"]
+        end_date = batch_data["end_date"]
+        daily_sales = batch_data.get("daily_sales", {})
+
+        # День 0 - день прихода, последний - end_date включительно
+        n_days = (end_date - arrival_date).days + 1
+        if n_days <= 0 or M0 <= 0:
+            return 0.0
 
-            total_shrinkage += daily_shrinkage
-            current_mass -= daily_shrinkage
+        survival = self._survival(a, b, n_days)
 
-            # Учет продаж в текущий день
-            if current_date in daily_sales:
-                current_mass -= daily_sales[current_date]
+        # Продажи нужны только в дни продаж: плотный массив по дням не строится
+        sold = 0.0
+        sold_discounted = 0.0
+        if daily_sales:
+            offsets = np.fromiter(daily_sales.keys(), np.int64, len(daily_sales))
+            offsets -= _as_date(arrival_date).toordinal()
+            quantities = np.fromiter(daily_sales.values(), np.float64, len(daily_sales))
+            in_period = (offsets >= 0) & (offsets < n_days)
+            quantities = quantities[in_period]
+            sold = float(quantities.sum())
+            sold_discounted = float(quantities @ (1.0 / survival[offsets[in_period]]))
 
-            current_date += timedelta(days=1)
-            day_counter += 1
+        final_mass = survival[-1] * (M0 - sold_discounted)
 
-        return total_shrinkage
+        return float(M0 - final_mass - sold)
+
+    @classmethod
+    def _survival(cls, a: float, b: float, n_days: int) -> np.ndarray:
+        """
+        Доли массы F[0..n_days-1], пережившей усушку (только для чтения)
+
+        Args:
+            a, b: Коэффициенты модели
+            n_days: Длина периода в днях
+
+        Returns:
+            Массив F[t] длины n_days (срез закэшированного ряда)
+        """
+        key = (a, b)
+        with cls._survival_cache_lock:
+            cached = cls._survival_cache.get(key)
+            if cached is not None and len(cached) >= n_days:
+                cls._survival_cache.move_to_end(key)
+                return cached[:n_days]
+
+        # Доля текущей массы, теряемая за день: M0 * a * b * e^(-b*t) * (M / M0).
+        # Все шаги до F[t] выполняются в одном буфере, без промежуточных массивов
+        survival = np.arange(n_days, dtype=np.float64)
+        survival *= -b
+        np.exp(survival, out=survival)
+        survival *= -a * b
+        survival += 1.0
+        np.cumprod(survival, out=survival)
+        # Массив общий для всех вызовов - защищаем от случайной записи
+        survival.setflags(write=False)
+
+        with cls._survival_cache_lock:
+            cached = cls._survival_cache.get(key)
+            if cached is None or len(cached) < n_days:
+                cls._survival_cache[key] = survival
+            cls._survival_cache.move_to_end(key)
+            while len(cls._survival_cache) > cls.SURVIVAL_CACHE_SIZE:
+                cls._survival_cache.popitem(last=False)
+
+        return survival
 
     def get_name(self) -> str:
         return "Взвешенная"
@@ -243,6 +367,28 @@ class FinalStrategy(ShrinkageStrategy):
         shrinkage: float = M0 * (a * (1 - math.exp(-b * T)) + c)
         return shrinkage
 
+    def calculate_batch(
+        self, batch_arrays: Dict[str, np.ndarray], coeffs: Dict[str, np.ndarray]
+    ) -> np.ndarray:
+        """
+        Рассчитывает усушку по модели совместимости сразу для многих партий
+
+        Args:
+            batch_arrays: Массивы по партиям:
+                         - initial_mass: начальные массы
+                         - days_stored: время хранения в днях
+            coeffs: Массивы коэффициентов a, b, c (по партиям)
+
+        Returns:
+            Массив усушки по партиям
+        """
+        a, b, c = coeffs["a"], coeffs["b"], coeffs["c"]
+        M0 = np.asarray(batch_arrays["initial_mass"], dtype=np.float64)
+        T = np.asarray(batch_arrays["days_stored"], dtype=np.float64)
+
+        result: np.ndarray = M0 * (a * (1 - np.exp(-b * T)) + c)
+        return result
+
     def get_name(self) -> str:
         return "Совместимости"
 
@@ -260,22 +406,24 @@ class StrategyFactory:
     созданием в различных частях приложения.
     """
 
-    _strategies: Dict[str, Type[ShrinkageStrategy]] = {
-        "portion": PortionStrategy,
-        "weighted": WeightedStrategy,
-        "final": FinalStrategy,
+    # Стратегии не хранят состояния, поэтому экземпляры создаются один раз
+    # и переиспользуются всеми вызывающими
+    _strategies: Dict[str, ShrinkageStrategy] = {
+        "portion": PortionStrategy(),
+        "weighted": WeightedStrategy(),
+        "final": FinalStrategy(),
     }
 
     @classmethod
     def create(cls, strategy_name: str) -> ShrinkageStrategy:
         """
-        Создаёт стратегию по имени
+        Возвращает стратегию по имени
 
         Args:
             strategy_name: Имя стратегии ('portion', 'weighted', или 'final')
 
         Returns:
-            Экземпляр соответствующей стратегии
+            Общий (неизменяемый) экземпляр соответствующей стратегии
 
         Raises:
             ValueError: Если указана неизвестная стратегия
@@ -286,8 +434,7 @@ class StrategyFactory:
                 f"Доступны: {list(cls._strategies.keys())}"
             )
 
-        strategy_class: Type[ShrinkageStrategy] = cls._strategies[strategy_name]
-        return strategy_class()
+        return cls._strategies[strategy_name]
 
     @classmethod
     def get_all_strategies(cls) -> List[str]:
@@ -4,13 +4,24 @@ SQLAlchemy 2.0 base configuration
 """
 
 import os
+from typing import Any, Dict
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import NullPool
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ocean_shop.db")
 
+# Пул соединений: "queue" (по умолчанию) - для Streamlit и долгоживущих
+# процессов, "null" - для коротких скриптов: соединение открывается на сессию
+# и закрывается сразу, без обслуживания пула
+DB_POOL = os.getenv("SHIELD_DB_POOL", "queue")
+if DB_POOL not in ("queue", "null"):
+    raise ValueError(f"SHIELD_DB_POOL должен быть 'queue' или 'null', а не {DB_POOL!r}")
+
+_pool_options: Dict[str, Any] = {"poolclass": NullPool} if DB_POOL == "null" else {}
+
 
 # Базовый класс для моделей
 class Base(DeclarativeBase):
@@ -22,6 +33,7 @@ engine = create_engine(
     DATABASE_URL,
     echo=False,
     future=True,  # True для отладки SQL  # SQLAlchemy 2.0 стиль
+    **_pool_options,
 )
 
 
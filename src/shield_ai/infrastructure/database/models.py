@@ -3,14 +3,22 @@ ORM модели SQLAlchemy 2.0 с современной типизацией (
 Синхронная работа
 """
 
+import os
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional, Sequence
 
-from sqlalchemy import DateTime, Float, ForeignKey, String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import DateTime, Float, ForeignKey, Index, String, select
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship, selectinload
 
 from .base import Base
 
+# Коллекции и коэффициенты не подгружаются лениво: забытый selectinload сразу
+# даёт ошибку вместо незаметных N+1 запросов. SHIELD_RELAX_LAZY=1 возвращает
+# обычную ленивую загрузку (для REPL и отладочных скриптов)
+COLLECTION_LAZY: Literal["select", "raise_on_sql"] = (
+    "select" if os.getenv("SHIELD_RELAX_LAZY") else "raise_on_sql"
+)
+
 
 class ProductModel(Base):
     """Товар"""
@@ -26,31 +34,57 @@ class ProductModel(Base):
 
     # Связи
     batches: Mapped[List["BatchModel"]] = relationship(
-        "BatchModel", back_populates="product", cascade="all, delete-orphan"
+        "BatchModel",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        lazy=COLLECTION_LAZY,
     )
     inventories: Mapped[List["InventoryModel"]] = relationship(
-        "InventoryModel", back_populates="product", cascade="all, delete-orphan"
+        "InventoryModel",
+        back_populates="product",
+        cascade="all, delete-orphan",
+        lazy=COLLECTION_LAZY,
     )
     coefficients: Mapped[Optional["ShrinkageCoefficientModel"]] = relationship(
         "ShrinkageCoefficientModel",
         back_populates="product",
         uselist=False,
         cascade="all, delete-orphan",
+        lazy=COLLECTION_LAZY,
     )
 
     def __repr__(self) -> str:
         return f"<ProductModel(id={self.id}, name='{self.name}')>"
 
+    @classmethod
+    def with_full_graph(cls, session: Session) -> Sequence["ProductModel"]:
+        """
+        Все товары вместе с партиями, продажами, инвентаризациями и коэффициентами
+
+        Каждая связь подгружается одним запросом SELECT ... IN, поэтому обход
+        product.batches / batch.sales / product.inventories не порождает
+        отдельный запрос на каждый товар или партию (N+1).
+        """
+        stmt = select(cls).options(
+            selectinload(cls.batches).selectinload(BatchModel.sales),
+            selectinload(cls.inventories),
+            selectinload(cls.coefficients),
+        )
+        return session.scalars(stmt).all()
+
 
 class BatchModel(Base):
     """Партия товара"""
 
     __tablename__ = "batches"
+    # FIFO-выборка партий товара идёт по (product_id, arrival_datetime);
+    # ведущий столбец заменяет отдельный индекс по product_id
+    __table_args__ = (
+        Index("ix_batches_product_arrival", "product_id", "arrival_datetime"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    product_id: Mapped[int] = mapped_column(
-        ForeignKey("products.id"), nullable=False, index=True
-    )
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
     arrival_date: Mapped[str] = mapped_column(String(20), nullable=False)
     arrival_datetime: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, index=True
@@ -63,7 +97,10 @@ class BatchModel(Base):
         "ProductModel", back_populates="batches"
     )
     sales: Mapped[List["SaleModel"]] = relationship(
-        "SaleModel", back_populates="batch", cascade="all, delete-orphan"
+        "SaleModel",
+        back_populates="batch",
+        cascade="all, delete-orphan",
+        lazy=COLLECTION_LAZY,
     )
 
     def __repr__(self) -> str:
@@ -74,11 +111,11 @@ class SaleModel(Base):
     """Продажа/расход"""
 
     __tablename__ = "sales"
+    # Продажи партии читаются по batch_id в порядке дат
+    __table_args__ = (Index("ix_sales_batch_date", "batch_id", "sale_date"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    batch_id: Mapped[int] = mapped_column(
-        ForeignKey("batches.id"), nullable=False, index=True
-    )
+    batch_id: Mapped[int] = mapped_column(ForeignKey("batches.id"), nullable=False)
     sale_date: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
     quantity: Mapped[float] = mapped_column(Float, nullable=False)
     document_name: Mapped[Optional[str]] = mapped_column(String(500))
@@ -96,11 +133,13 @@ class InventoryModel(Base):
     """Инвентаризация"""
 
     __tablename__ = "inventories"
+    # Инвентаризации товара читаются по product_id в порядке дат
+    __table_args__ = (
+        Index("ix_inventories_product_date", "product_id", "inventory_date"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    product_id: Mapped[int] = mapped_column(
-        ForeignKey("products.id"), nullable=False, index=True
-    )
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
     inventory_date: Mapped[datetime] = mapped_column(
         DateTime, nullable=False, index=True
     )
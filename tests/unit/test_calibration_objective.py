@@ -0,0 +1,139 @@
+"""
+Тесты целевой функции калибровки: остатки, аналитический Якобиан и подбор
+коэффициентов least_squares
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pytest
+
+from shield_ai.application.use_cases.calibrate_coefficients import (
+    CalibrateCoefficientsUseCase,
+)
+
+# pylint: disable=protected-access
+make_objective = CalibrateCoefficientsUseCase._make_objective
+fit_coefficients = CalibrateCoefficientsUseCase._fit_coefficients
+
+
+def _points(
+    rng: np.random.Generator, n_points: int, coeffs: Dict[str, float]
+) -> List[Dict[str, Any]]:
+    """Синтетические точки: фактическая усушка посчитана порционной моделью"""
+    a, b, c = coeffs["a"], coeffs["b"], coeffs["c"]
+    data = []
+    for _ in range(n_points):
+        n_sales = int(rng.integers(0, 12))
+        days = rng.integers(0, 60, n_sales).astype(np.int64)
+        quantities = rng.uniform(0.5, 20.0, n_sales)
+        data.append(
+            {
+                "days": days,
+                "quantities": quantities,
+                "actual_shrinkage": float(
+                    quantities @ (a * (1.0 - np.exp(-b * days)) + c)
+                ),
+            }
+        )
+    return data
+
+
+def _scalar_residuals(data: List[Dict[str, Any]], x: np.ndarray) -> np.ndarray:
+    """Исходный расчёт остатков по каждой точке отдельно"""
+    a, b, c = x
+    return np.array(
+        [
+            point["quantities"] @ (a * (1.0 - np.exp(-b * point["days"])) + c)
+            - point["actual_shrinkage"]
+            for point in data
+        ]
+    )
+
+
+@pytest.fixture(name="data")
+def fixture_data() -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(11)
+    data = _points(rng, 25, {"a": 0.07, "b": 0.2, "c": 0.015})
+    for point in data:
+        point["actual_shrinkage"] += float(rng.normal(0.0, 0.3))
+    return data
+
+
+@pytest.mark.parametrize(
+    "x", [[0.05, 0.1, 0.01], [0.01, 0.5, 0.0], [0.15, 0.01, 0.03], [0.11, 0.27, 0.02]]
+)
+def test_residuals_match_scalar_formula(
+    data: List[Dict[str, Any]], x: List[float]
+) -> None:
+    residuals, _, n_points = make_objective(data)
+    params = np.array(x)
+    assert n_points == len(data)
+    np.testing.assert_allclose(
+        residuals(params), _scalar_residuals(data, params), rtol=1e-12, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize(
+    "x", [[0.05, 0.1, 0.01], [0.01, 0.5, 0.0], [0.15, 0.01, 0.03], [0.11, 0.27, 0.02]]
+)
+def test_jacobian_matches_finite_differences(
+    data: List[Dict[str, Any]], x: List[float]
+) -> None:
+    residuals, jacobian, _ = make_objective(data)
+    params = np.array(x)
+    step = 1e-6
+    numeric = np.empty((len(data), 3))
+    for k in range(3):
+        shift = np.zeros(3)
+        shift[k] = step
+        numeric[:, k] = (residuals(params + shift) - residuals(params - shift)) / (
+            2 * step
+        )
+    np.testing.assert_allclose(jacobian(params), numeric, rtol=1e-6, atol=1e-6)
+
+
+def test_jacobian_after_residuals_with_other_b(data: List[Dict[str, Any]]) -> None:
+    # Суммы по b кэшируются: Якобиан в новой точке не должен взять старые
+    residuals, jacobian, _ = make_objective(data)
+    residuals(np.array([0.05, 0.1, 0.01]))
+    expected = make_objective(data)[1](np.array([0.05, 0.3, 0.01]))
+    np.testing.assert_array_equal(jacobian(np.array([0.05, 0.3, 0.01])), expected)
+
+
+@pytest.mark.parametrize(
+    "coeffs",
+    [
+        {"a": 0.08, "b": 0.15, "c": 0.01},
+        {"a": 0.12, "b": 0.35, "c": 0.025},
+        {"a": 0.03, "b": 0.05, "c": 0.002},
+    ],
+)
+def test_fit_recovers_known_coefficients(coeffs: Dict[str, float]) -> None:
+    data = _points(np.random.default_rng(5), 40, coeffs)
+    result = fit_coefficients(data)
+    assert result["status"] == "калиброван"
+    assert result["data_points"] == 40
+    assert result["rmse"] == pytest.approx(0.0, abs=1e-6)
+    for name, value in coeffs.items():
+        assert result[name] == pytest.approx(value, rel=1e-4, abs=1e-6)
+
+
+def test_warm_start_outside_bounds_is_clamped() -> None:
+    coeffs = {"a": 0.08, "b": 0.15, "c": 0.01}
+    data = _points(np.random.default_rng(8), 30, coeffs)
+    # Старые коэффициенты могли быть сохранены до сужения границ
+    result = fit_coefficients(data, [0.4, -1.0, 0.2])
+    assert result["status"] == "калиброван"
+    assert 0.01 <= result["a"] <= 0.15
+    assert 0.01 <= result["b"] <= 0.5
+    assert 0.0 <= result["c"] <= 0.03
+    assert result["rmse"] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_too_few_points_returns_defaults() -> None:
+    data = _points(np.random.default_rng(1), 2, {"a": 0.08, "b": 0.15, "c": 0.01})
+    result = fit_coefficients(data)
+    assert result["status"] == "стандартные"
+    assert result["rmse"] is None
+    assert result["data_points"] == 2
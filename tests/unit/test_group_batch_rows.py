@@ -0,0 +1,73 @@
+"""
+Тесты группировки строк JOIN партий и продаж для калибровки
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from shield_ai.application.use_cases.calibrate_coefficients import (
+    CalibrateCoefficientsUseCase,
+)
+
+# pylint: disable=protected-access
+group_batch_rows = CalibrateCoefficientsUseCase._group_batch_rows
+
+ARRIVAL = datetime(2025, 1, 10, 15, 0)
+
+
+def test_empty() -> None:
+    assert not group_batch_rows([])
+
+
+def test_days_and_quantities_per_batch() -> None:
+    # Строки отсортированы по партии, как в order_by(BatchModel.id, SaleModel.id)
+    rows = [
+        (1, 10, 100.0, ARRIVAL, datetime(2025, 1, 10, 18, 0), 2.0),
+        # Продажа до прихода отбрасывается
+        (1, 10, 100.0, ARRIVAL, datetime(2025, 1, 9, 12, 0), 9.0),
+        # Следующий календарный день, но меньше 24 ч после прихода - день 0
+        (1, 10, 100.0, ARRIVAL, datetime(2025, 1, 11, 9, 0), 3.0),
+        (1, 10, 100.0, ARRIVAL, datetime(2025, 1, 11, 15, 0), 4.0),
+        (1, 10, 100.0, ARRIVAL, datetime(2025, 1, 20, 14, 59), 5.0),
+        # Партия без продаж: OUTER JOIN даёт NULL в полях продажи
+        (1, 11, 50.0, ARRIVAL, None, None),
+        (2, 12, 80.0, datetime(2025, 2, 1), datetime(2025, 2, 3), 1.5),
+        (2, 12, 80.0, datetime(2025, 2, 1), datetime(2025, 1, 31, 23, 59), 7.0),
+    ]
+    batches = group_batch_rows(rows)
+
+    assert sorted(batches) == [1, 2]
+    assert sorted(batches[1]) == [10, 11]
+    assert list(batches[2]) == [12]
+
+    batch = batches[1][10]
+    assert batch["initial_mass"] == 100.0
+    assert batch["arrival_date"] == ARRIVAL
+    np.testing.assert_array_equal(batch["days"], [0, 0, 1, 9])
+    np.testing.assert_array_equal(batch["quantities"], [2.0, 3.0, 4.0, 5.0])
+
+    empty = batches[1][11]
+    assert empty["initial_mass"] == 50.0
+    assert len(empty["days"]) == 0
+    assert len(empty["quantities"]) == 0
+
+    np.testing.assert_array_equal(batches[2][12]["days"], [2])
+    np.testing.assert_array_equal(batches[2][12]["quantities"], [1.5])
+
+    # Служебные границы срезов не остаются в данных партии
+    assert {"start", "stop"}.isdisjoint(batch)
+
+
+def test_days_match_timedelta_days() -> None:
+    sales = [
+        datetime(2025, 1, 10, 14, 59),
+        datetime(2025, 1, 10, 15, 0),
+        datetime(2025, 1, 11, 14, 59, 59, 999999),
+        datetime(2025, 1, 11, 15, 0),
+        datetime(2025, 3, 1, 0, 0),
+    ]
+    rows = [(1, 1, 10.0, ARRIVAL, sale, 1.0) for sale in sales]
+    days = group_batch_rows(rows)[1][1]["days"]
+    expected = [(sale - ARRIVAL).days for sale in sales if (sale - ARRIVAL).days >= 0]
+    assert days.tolist() == expected
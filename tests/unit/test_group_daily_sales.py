@@ -0,0 +1,52 @@
+"""
+Тесты группировки продаж прогноза по партиям и дням
+"""
+
+from datetime import date
+
+from shield_ai.application.use_cases.forecast_shrinkage import ForecastShrinkageUseCase
+
+# pylint: disable=protected-access
+group_daily_sales = ForecastShrinkageUseCase._group_daily_sales
+
+
+def test_empty() -> None:
+    assert not group_daily_sales([])
+
+
+def test_iso_strings_from_sqlite() -> None:
+    rows = [
+        (2, "2025-01-11", 1.5),
+        (1, "2025-01-10", 2.0),
+        (1, "2025-01-12", 4.0),
+        (1, "2025-01-10", 3.0),
+        (2, "2025-01-11", 0.5),
+    ]
+    assert group_daily_sales(rows) == {
+        1: {date(2025, 1, 10).toordinal(): 5.0, date(2025, 1, 12).toordinal(): 4.0},
+        2: {date(2025, 1, 11).toordinal(): 2.0},
+    }
+
+
+def test_date_values() -> None:
+    rows = [
+        (7, date(2024, 12, 31), 1.0),
+        (7, date(2025, 1, 1), 2.0),
+        (7, date(2024, 12, 31), 0.25),
+        (3, date(2025, 1, 1), 6.0),
+    ]
+    assert group_daily_sales(rows) == {
+        3: {date(2025, 1, 1).toordinal(): 6.0},
+        7: {
+            date(2024, 12, 31).toordinal(): 1.25,
+            date(2025, 1, 1).toordinal(): 2.0,
+        },
+    }
+
+
+def test_keys_are_python_ints() -> None:
+    grouped = group_daily_sales([(1, "2025-03-01", 1.0)])
+    (batch_id, days), *_ = grouped.items()
+    # Не np.int64: ключи сравниваются и хэшируются как обычные int
+    assert isinstance(batch_id, int)
+    assert all(isinstance(day, int) for day in days)
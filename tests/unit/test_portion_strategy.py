@@ -0,0 +1,150 @@
+"""
+Тесты порционной модели и модели совместимости: сравнение NumPy-расчёта
+со скалярной формулой
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from shield_ai.domain.shrinkage.strategies import FinalStrategy, PortionStrategy
+
+COEFFS = {"a": 0.08, "b": 0.15, "c": 0.01}
+ARRIVAL = datetime(2025, 1, 10, 14, 30)
+OFFSETS = [-3, -1, 0, 0, 1, 5, 17, 40]
+QUANTITIES = [4.0, 1.5, 2.0, 3.0, 0.5, 10.0, 7.25, 6.0]
+
+
+def _scalar(
+    days: List[int], quantities: List[float], coeffs: Dict[str, float]
+) -> float:
+    """Исходный расчёт по продажам: m * [a * (1 - e^(-b*t)) + c] при t >= 0"""
+    a, b, c = coeffs["a"], coeffs["b"], coeffs["c"]
+    return sum(
+        m * (a * (1 - math.exp(-b * t)) + c) for t, m in zip(days, quantities) if t >= 0
+    )
+
+
+def _by_date(offset: int, quantity: float) -> Dict[str, object]:
+    return {"date": ARRIVAL + timedelta(days=offset), "quantity": quantity}
+
+
+def _by_offset(offset: int, quantity: float) -> Dict[str, object]:
+    return {"day_offset": offset, "quantity": quantity}
+
+
+def _sales(form: str) -> List[Dict[str, object]]:
+    """Продажи OFFSETS/QUANTITIES датами, днями хранения или вперемешку"""
+    return [
+        (
+            _by_offset(t, m)
+            if form == "offset" or (form == "mixed" and i % 2)
+            else _by_date(t, m)
+        )
+        for i, (t, m) in enumerate(zip(OFFSETS, QUANTITIES))
+    ]
+
+
+@pytest.mark.parametrize("form", ["date", "offset", "mixed"])
+def test_calculate_matches_scalar_formula(form: str) -> None:
+    batch_data = {"arrival_date": ARRIVAL, "sales": _sales(form)}
+    assert PortionStrategy().calculate(batch_data, COEFFS) == pytest.approx(
+        _scalar(OFFSETS, QUANTITIES, COEFFS), rel=1e-14
+    )
+
+
+def test_mixed_sales_match_single_form() -> None:
+    # Регрессия: смешанный список раньше падал с KeyError
+    strategy = PortionStrategy()
+    assert strategy.calculate(
+        {"arrival_date": ARRIVAL, "sales": _sales("mixed")}, COEFFS
+    ) == strategy.calculate({"arrival_date": ARRIVAL, "sales": _sales("date")}, COEFFS)
+
+
+def test_offsets_without_arrival_date() -> None:
+    sales = [_by_offset(t, m) for t, m in zip(OFFSETS, QUANTITIES)]
+    assert PortionStrategy().calculate({"sales": sales}, COEFFS) == pytest.approx(
+        _scalar(OFFSETS, QUANTITIES, COEFFS), rel=1e-14
+    )
+
+
+def test_only_sales_before_arrival() -> None:
+    sales = [_by_offset(-2, 5.0), _by_date(-1, 3.0)]
+    batch_data = {"arrival_date": ARRIVAL, "sales": sales}
+    assert PortionStrategy().calculate(batch_data, COEFFS) == 0.0
+
+
+@pytest.mark.parametrize("batch_data", [{"arrival_date": ARRIVAL, "sales": []}, {}])
+def test_no_sales(batch_data: Dict[str, object]) -> None:
+    assert PortionStrategy().calculate(batch_data, COEFFS) == 0.0
+
+
+def test_calculate_batch_matches_scalar_formula() -> None:
+    # Партия 1 без продаж: результат 0 обеспечивается minlength
+    batch_ids = [0, 0, 0, 2, 2, 2, 3, 3]
+    n_batches = 5
+    coeffs = {
+        "a": np.array([0.08, 0.05, 0.12, 0.03, 0.1]),
+        "b": np.array([0.15, 0.1, 0.35, 0.05, 0.2]),
+        "c": np.array([0.01, 0.0, 0.025, 0.002, 0.02]),
+    }
+    result = PortionStrategy().calculate_batch(
+        {
+            "quantities": np.array(QUANTITIES),
+            "days": np.array(OFFSETS),
+            "batch_ids": np.array(batch_ids),
+            "n_batches": np.array(n_batches),
+        },
+        coeffs,
+    )
+
+    assert result.shape == (n_batches,)
+    for batch in range(n_batches):
+        sales = [i for i, owner in enumerate(batch_ids) if owner == batch]
+        batch_coeffs = {name: float(values[batch]) for name, values in coeffs.items()}
+        expected = _scalar(
+            [OFFSETS[i] for i in sales], [QUANTITIES[i] for i in sales], batch_coeffs
+        )
+        assert result[batch] == pytest.approx(expected, rel=1e-14, abs=1e-15)
+    assert result[1] == 0.0
+    assert result[4] == 0.0
+
+
+def test_calculate_batch_n_batches_defaults_to_coeffs_length() -> None:
+    coeffs = {name: np.full(3, value) for name, value in COEFFS.items()}
+    result = PortionStrategy().calculate_batch(
+        {
+            "quantities": np.array([2.0, 3.0]),
+            "days": np.array([4, 9]),
+            "batch_ids": np.array([0, 0]),
+        },
+        coeffs,
+    )
+    np.testing.assert_allclose(
+        result, [_scalar([4, 9], [2.0, 3.0], COEFFS), 0.0, 0.0], rtol=1e-14
+    )
+
+
+def test_final_calculate_batch_matches_calculate() -> None:
+    masses = np.array([100.0, 0.0, 250.0, 42.5])
+    days_stored = np.array([0, 10, 3, 120])
+    coeffs = {
+        "a": np.array([0.08, 0.05, 0.12, 0.03]),
+        "b": np.array([0.15, 0.1, 0.35, 0.05]),
+        "c": np.array([0.01, 0.0, 0.025, 0.002]),
+    }
+    strategy = FinalStrategy()
+    result = strategy.calculate_batch(
+        {"initial_mass": masses, "days_stored": days_stored}, coeffs
+    )
+    expected = [
+        strategy.calculate(
+            {"initial_mass": float(masses[i]), "days_stored": int(days_stored[i])},
+            {name: float(values[i]) for name, values in coeffs.items()},
+        )
+        for i in range(len(masses))
+    ]
+    np.testing.assert_allclose(result, expected, rtol=1e-14)
@@ -0,0 +1,129 @@
+"""
+Тесты взвешенной модели: сравнение закрытой формы с пошаговым расчётом по дням
+"""
+
+import math
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple, Union
+
+import pytest
+
+from shield_ai.domain.shrinkage.strategies import WeightedStrategy
+
+COEFFS = {"a": 0.08, "b": 0.15, "c": 0.01}
+ARRIVAL = datetime(2025, 1, 10, 14, 30)
+
+
+def _reference(
+    initial_mass: float,
+    arrival: Union[date, datetime],
+    end: Union[date, datetime],
+    sales: List[Tuple[date, float]],
+    coeffs: Dict[str, float],
+) -> float:
+    """Исходный пошаговый расчёт: усушка и продажи день за днём"""
+    a, b = coeffs["a"], coeffs["b"]
+    mass = initial_mass
+    total = 0.0
+    current = arrival
+    day = 0
+    while current <= end:
+        shrinkage = initial_mass * a * b * math.exp(-b * day) * mass / initial_mass
+        total += shrinkage
+        mass -= shrinkage
+        current_day = current.date() if isinstance(current, datetime) else current
+        for sale_day, quantity in sales:
+            if sale_day == current_day:
+                mass -= quantity
+        current += timedelta(days=1)
+        day += 1
+    return total
+
+
+def _calculate(
+    initial_mass: float,
+    arrival: Union[date, datetime],
+    end: Union[date, datetime],
+    sales: List[Tuple[date, float]],
+    coeffs: Dict[str, float],
+) -> float:
+    """Расчёт стратегией; продажи суммируются по дням, как в прогнозе"""
+    daily_sales: Dict[int, float] = {}
+    for sale_day, quantity in sales:
+        key = sale_day.toordinal()
+        daily_sales[key] = daily_sales.get(key, 0.0) + quantity
+    batch_data = {
+        "initial_mass": initial_mass,
+        "arrival_date": arrival,
+        "end_date": end,
+        "daily_sales": daily_sales,
+    }
+    return WeightedStrategy().calculate(batch_data, coeffs)
+
+
+@pytest.mark.parametrize(
+    "sales",
+    [
+        pytest.param([], id="без продаж"),
+        pytest.param(
+            [(date(2025, 1, 5), 10.0), (date(2025, 1, 9), 5.0)], id="до прихода"
+        ),
+        pytest.param(
+            [(date(2025, 3, 1), 10.0), (date(2025, 4, 1), 5.0)],
+            id="после end_date",
+        ),
+        pytest.param(
+            [(date(2025, 1, 15), 4.0), (date(2025, 1, 15), 6.0)],
+            id="несколько в один день",
+        ),
+        pytest.param(
+            [
+                (date(2025, 1, 10), 3.0),
+                (date(2025, 1, 20), 12.0),
+                (date(2025, 2, 1), 7.5),
+                (date(2025, 2, 27), 20.0),
+            ],
+            id="смешанные",
+        ),
+    ],
+)
+def test_matches_reference_loop(sales: List[Tuple[date, float]]) -> None:
+    end = datetime(2025, 2, 28, 9, 0)
+    expected = _reference(200.0, ARRIVAL, end, sales, COEFFS)
+    assert _calculate(200.0, ARRIVAL, end, sales, COEFFS) == pytest.approx(
+        expected, rel=1e-12
+    )
+
+
+def test_sales_outside_period_are_ignored() -> None:
+    end = datetime(2025, 2, 28)
+    outside = [(date(2025, 1, 1), 50.0), (date(2025, 3, 5), 50.0)]
+    assert _calculate(200.0, ARRIVAL, end, outside, COEFFS) == pytest.approx(
+        _calculate(200.0, ARRIVAL, end, [], COEFFS), rel=1e-15
+    )
+
+
+def test_zero_initial_mass() -> None:
+    assert _calculate(0.0, ARRIVAL, datetime(2025, 2, 28), [], COEFFS) == 0.0
+
+
+def test_end_before_arrival() -> None:
+    end = ARRIVAL - timedelta(days=3)
+    assert _calculate(200.0, ARRIVAL, end, [(ARRIVAL.date(), 5.0)], COEFFS) == 0.0
+
+
+def test_random_batches() -> None:
+    rng = random.Random(3)
+    for _ in range(300):
+        arrival = datetime(2025, 1, 1) + timedelta(hours=rng.randint(0, 2000))
+        end = arrival + timedelta(hours=rng.randint(0, 4000))
+        sales = [
+            (arrival.date() + timedelta(days=rng.randint(-3, 200)), rng.uniform(0, 5))
+            for _ in range(rng.randint(0, 25))
+        ]
+        coeffs = {"a": rng.uniform(0.01, 0.15), "b": rng.uniform(0.01, 0.5), "c": 0}
+        mass = rng.uniform(100, 1000)
+        assert _calculate(mass, arrival, end, sales, coeffs) == pytest.approx(
+            _reference(mass, arrival, end, sales, coeffs), rel=1e-10, abs=1e-9
+        )